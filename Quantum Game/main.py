@@ -1,65 +1,116 @@
+import functools
+import os
 import pygame
-import random
+import numpy as np
 from qiskit import QuantumCircuit
 from qiskit_aer import Aer, AerSimulator
 from qiskit.result import Result
 
 # Quantum utility functions
 
-# Cache the backend for efficiency
-_q_backend = AerSimulator()
+# Cache the backend for efficiency. Every circuit here is a single layer of H gates
+# followed by measurement, so there is nothing for gate fusion to merge or truncation
+# to remove, and per-run thread start-up costs more than the simulation itself.
+_q_backend = AerSimulator(max_parallel_threads=1, fusion_enable=False, enable_truncation=False)
 
-def quantum_random_int(max_value):
-    """Generate a quantum random integer in [0, max_value)."""
+# Enemy random-walk steps: down, up, right, left, stay
+ENEMY_MOVES = np.array([(0,1),(0,-1),(1,0),(-1,0),(0,0)], dtype=np.int16)
+
+# Wall and path colours, indexed by maze cell value
+_MAZE_PALETTE = np.array([(50,50,50), (200,200,200)], dtype=np.uint8)
+
+# Classical entropy pool backing the random integer helpers
+_POOL_SIZE = 4096
+_entropy_pool = bytearray()
+_pool_idx = 0
+
+def _entropy_bytes(n_bytes):
+    """Take n_bytes from the entropy pool, refilling it in bulk when it runs dry."""
+    global _entropy_pool, _pool_idx
+    if _pool_idx + n_bytes > len(_entropy_pool):
+        _entropy_pool = bytearray(os.urandom(max(_POOL_SIZE, n_bytes)))
+        _pool_idx = 0
+    chunk = _entropy_pool[_pool_idx:_pool_idx + n_bytes]
+    _pool_idx += n_bytes
+    return chunk
+
+@functools.lru_cache(maxsize=16)
+def _hadamard_all_circuit(n_qubits):
+    """Return a cached circuit putting n_qubits in uniform superposition and measuring them all."""
+    # h and measure are native to Aer, so the circuit runs without transpiling
+    qc = QuantumCircuit(n_qubits)
+    qc.h(range(n_qubits))
+    qc.measure_all()
+    return qc
+
+def quantum_random_int(max_value, use_qiskit=False):
+    """Generate a random integer in [0, max_value). Set use_qiskit to sample it from the simulator."""
     n_qubits = max_value.bit_length()
+    if not use_qiskit:
+        n_bytes = (n_qubits + 7) // 8
+        mask = (1 << n_qubits) - 1
+        while True:
+            value = int.from_bytes(_entropy_bytes(n_bytes), 'little') & mask
+            if value < max_value:
+                return value
+    qc = _hadamard_all_circuit(n_qubits)
     while True:
-        qc = QuantumCircuit(n_qubits)
-        qc.h(range(n_qubits))
-        qc.measure_all()
-        job = _q_backend.run(qc, shots=1)
+        job = _q_backend.run(qc, shots=1, memory=True)
         result = job.result()
-        counts = result.get_counts()
-        value = int(list(counts.keys())[0], 2)
+        value = int(result.get_memory()[0], 2)
         if value < max_value:
             return value
 
-def quantum_random_int_batch(max_value, batch_size):
-    """Generate a batch of quantum random integers in [0, max_value)."""
+def quantum_random_int_batch(max_value, batch_size, use_qiskit=False):
+    """Generate a batch of random integers in [0, max_value). Set use_qiskit to sample them from the simulator."""
     n_qubits = max_value.bit_length()
-    qc = QuantumCircuit(n_qubits)
-    qc.h(range(n_qubits))
-    qc.measure_all()
-    job = _q_backend.run(qc, shots=batch_size)
-    result = job.result()
-    counts = result.get_counts()
+    if not use_qiskit:
+        n_bytes = (n_qubits + 7) // 8
+        mask = (1 << n_qubits) - 1
+        values = np.empty(0, dtype=np.int64)
+        while len(values) < batch_size:
+            raw = np.frombuffer(_entropy_bytes(n_bytes * batch_size), dtype=np.uint8).reshape(batch_size, n_bytes)
+            drawn = np.zeros(batch_size, dtype=np.int64)
+            for i in range(n_bytes):
+                drawn |= raw[:, i].astype(np.int64) << (8 * i)
+            drawn &= mask
+            values = np.concatenate((values, drawn[drawn < max_value]))
+        return values[:batch_size].tolist()
+    qc = _hadamard_all_circuit(n_qubits)
     values = []
-    for key in counts:
-        value = int(key, 2)
-        if value < max_value:
-            values.extend([value] * counts[key])
+    # Rejected shots are replaced with further runs so both paths return batch_size values
+    while len(values) < batch_size:
+        job = _q_backend.run(qc, shots=batch_size, memory=True)
+        result = job.result()
+        for bits in result.get_memory():
+            value = int(bits, 2)
+            if value < max_value:
+                values.append(value)
     return values[:batch_size]
 
 def quantum_maze_visibility(size, start=(0,0), goal=None):
-    """Return a 2D grid of booleans for path visibility using quantum superposition. Ensures start and goal are open."""
+    """Return a (size, size) boolean array for path visibility using quantum superposition. Ensures start and goal are open."""
     if goal is None:
         goal = (size//2, size//2)
-    grid = []
-    for y in range(size):
-        row = []
-        qc = QuantumCircuit(size)
-        qc.h(range(size))
-        qc.measure_all()
-        job = _q_backend.run(qc, shots=1)
-        result = job.result()
-        bits = list(result.get_counts().keys())[0]
-        for x, bit in enumerate(bits[::-1]):
-            row.append(bit == '1')
-        grid.append(row)
+    qc = _hadamard_all_circuit(size)
+    # One shot per row, all submitted in a single run
+    job = _q_backend.run(qc, shots=size, memory=True)
+    result = job.result()
+    # Bit x of each row's measured value says whether cell x is open
+    if size > 64:
+        # Rows wider than a uint64 are unpacked from their little-endian bytes instead
+        n_bytes = (size + 7) // 8
+        grid = np.array([np.unpackbits(np.frombuffer(int(bits, 2).to_bytes(n_bytes, 'little'), dtype=np.uint8),
+                                       bitorder='little')[:size]
+                         for bits in result.get_memory()], dtype=bool)
+    else:
+        values = np.array([int(bits, 2) for bits in result.get_memory()], dtype=np.uint64)
+        grid = ((values[:, None] >> np.arange(size, dtype=np.uint64)) & np.uint64(1)).astype(bool)
     # Ensure start and goal are open
     sx, sy = start
     gx, gy = goal
-    grid[sy][sx] = True
-    grid[gy][gx] = True
+    grid[sy, sx] = True
+    grid[gy, gx] = True
     return grid
 
 def entangled_move(pos1, pos2, move, grid_size):
@@ -67,13 +118,46 @@ def entangled_move(pos1, pos2, move, grid_size):
     x1, y1 = pos1
     x2, y2 = pos2
     dx, dy = move
-    # Mirror move for entanglement
-    new_pos1 = (max(0, min(grid_size-1, x1 + dx)), max(0, min(grid_size-1, y1 + dy)))
-    new_pos2 = (max(0, min(grid_size-1, x2 - dx)), max(0, min(grid_size-1, y2 - dy)))
-    return new_pos1, new_pos2
+    m = grid_size - 1
+    # Mirror move for entanglement, clamped to the grid
+    nx1 = x1 + dx
+    nx1 = 0 if nx1 < 0 else m if nx1 > m else nx1
+    ny1 = y1 + dy
+    ny1 = 0 if ny1 < 0 else m if ny1 > m else ny1
+    nx2 = x2 - dx
+    nx2 = 0 if nx2 < 0 else m if nx2 > m else nx2
+    ny2 = y2 - dy
+    ny2 = 0 if ny2 < 0 else m if ny2 > m else ny2
+    return (nx1, ny1), (nx2, ny2)
+
+HANDLED_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.VIDEOEXPOSE)
+
+INSTRUCTIONS = [
+    "Quantum Adventure Game",
+    "",
+    "Use the arrow keys to move the blue player",
+    "The pink player is quantum entangled and moves in mirrored directions",
+    "Avoid the red enemies",
+    "Try to reach the green goal with either player",
+    "The maze paths (white squares) are generated using quantum superposition",
+    "The enemy movements are random walks",
+    "The game ends when either:",
+    "- One of the players reaches the goal (you win!)",
+    "- One of the players collides with an enemy (game over)",
+    "",
+    "Press any key to start..."
+]
 
 # Main game class
 class QuantumAdventureGame:
+    # Fixed attribute layout: no per-instance __dict__ on the hot draw/update paths
+    __slots__ = ('grid_size', 'cell_size', 'window_size', 'screen', 'clock',
+                 'enemy_move_delay', 'enemy_move_counter', 'goal', 'maze',
+                 'player1_pos', 'player2_pos', 'running', '_rects', '_font_end',
+                 '_font_inst', '_instruction_surfs', '_end_surfs', '_tile_goal',
+                 '_tile_player1', '_tile_player2', '_tile_enemy', '_bg', '_rng',
+                 '_dirty', '_enemies_arr')
+
     def __init__(self, grid_size=10):
         pygame.init()
         self.grid_size = grid_size
@@ -82,29 +166,77 @@ class QuantumAdventureGame:
         self.screen = pygame.display.set_mode(self.window_size)
         pygame.display.set_caption('Quantum Adventure Game')
         self.clock = pygame.time.Clock()
+        # Only quit, key presses and expose (repaint) are handled, so keep everything else out of the queue
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(HANDLED_EVENTS)
+        self._font_end = pygame.font.SysFont(None, 36)
+        self._font_inst = pygame.font.SysFont(None, 32)
+        # Text never changes, so render it once
+        self._instruction_surfs = []
+        for i, line in enumerate(INSTRUCTIONS):
+            text = self._font_inst.render(line, True, (255,255,255))
+            rect = text.get_rect(center=(self.screen.get_width()//2, 40 + i*36))
+            self._instruction_surfs.append((text, rect))
+        self._end_surfs = {}
         self.enemy_move_delay = 5  # Delay in frames for enemy movement
         self.enemy_move_counter = 0
+        self._rng = np.random.default_rng()
+        # Cell rects and single-colour tiles are reused every frame
+        offset_x = (self.screen.get_width() - self.grid_size * self.cell_size) // 2
+        offset_y = (self.screen.get_height() - self.grid_size * self.cell_size) // 2
+        self._rects = [[pygame.Rect(offset_x + x*self.cell_size, offset_y + y*self.cell_size, self.cell_size, self.cell_size)
+                        for x in range(self.grid_size)] for y in range(self.grid_size)]
+        self._tile_goal = self._make_tile((0,255,0))
+        self._tile_player1 = self._make_tile((0,0,255))
+        self._tile_player2 = self._make_tile((255,0,255))
+        self._tile_enemy = self._make_tile((255,0,0))
+        self._bg = pygame.Surface(self.window_size)
         self.reset_game()
 
+    def _make_tile(self, color):
+        tile = pygame.Surface((self.cell_size, self.cell_size))
+        tile.fill(color)
+        return tile
+
     def reset_game(self):
         self.goal = (self.grid_size//2, self.grid_size//2)
         self.maze = quantum_maze_visibility(self.grid_size, start=(0,0), goal=self.goal)
+        self._render_background()
         self.player1_pos = (0, 0)
         self.player2_pos = (self.grid_size-1, self.grid_size-1)
-        self.enemies = [self.random_empty_cell() for _ in range(3)]
+        self._enemies_arr = np.array(self.random_empty_cells(3), dtype=np.int16)
         self.running = True
+        self._dirty = True
 
-    def random_empty_cell(self):
-        while True:
-            x = quantum_random_int(self.grid_size)
-            y = quantum_random_int(self.grid_size)
-            if self.maze[y][x] and (x, y) not in [self.player1_pos, self.player2_pos, self.goal]:
-                return (x, y)
+    def _render_background(self):
+        # The maze and goal are fixed until the next reset, so render them once
+        # Scale the per-cell colours up to one pixel block per cell and copy them in one go
+        cell_colors = _MAZE_PALETTE[self.maze.astype(np.uint8)]
+        pixels = np.repeat(np.repeat(cell_colors, self.cell_size, axis=0), self.cell_size, axis=1)
+        pygame.surfarray.blit_array(self._bg, pixels.swapaxes(0, 1))
+        gx, gy = self.goal
+        self._bg.blit(self._tile_goal, self._rects[gy][gx])
+
+    def random_empty_cells(self, count):
+        # Draw candidate coordinates in bulk and keep the first open, unoccupied cells
+        excluded = (self.player1_pos, self.player2_pos, self.goal)
+        cells = []
+        while len(cells) < count:
+            coords = quantum_random_int_batch(self.grid_size, 64)
+            for x, y in zip(coords[::2], coords[1::2]):
+                if self.maze[y, x] and (x, y) not in excluded:
+                    cells.append((x, y))
+                    if len(cells) == count:
+                        break
+        return cells
 
     def handle_input(self):
-        for event in pygame.event.get():
+        for event in pygame.event.get(HANDLED_EVENTS):
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                # The window was uncovered or restored, so its contents must be repainted
+                self._dirty = True
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     self.reset_game()
@@ -123,119 +255,101 @@ class QuantumAdventureGame:
 
     def move_players(self, move):
         new_pos1, new_pos2 = entangled_move(self.player1_pos, self.player2_pos, move, self.grid_size)
-        if self.is_valid(new_pos1):
+        if self.is_valid(new_pos1) and new_pos1 != self.player1_pos:
             self.player1_pos = new_pos1
-        if self.is_valid(new_pos2):
+            self._dirty = True
+        if self.is_valid(new_pos2) and new_pos2 != self.player2_pos:
             self.player2_pos = new_pos2
+            self._dirty = True
 
     def is_valid(self, pos):
         x, y = pos
-        return 0 <= x < self.grid_size and 0 <= y < self.grid_size and self.maze[y][x]
+        grid_size = self.grid_size
+        return 0 <= x < grid_size and 0 <= y < grid_size and self.maze[y, x]
 
     def update(self):
         # Increment the enemy move counter
         self.enemy_move_counter += 1
         if self.enemy_move_counter >= self.enemy_move_delay:
             self.enemy_move_counter = 0  # Reset counter
-            # Perform enemy movement
-            new_enemies = []
-            for ex, ey in self.enemies:
-                move = random.choice([(0,1),(0,-1),(1,0),(-1,0),(0,0)])
-                nx, ny = ex + move[0], ey + move[1]
-                if 0 <= nx < self.grid_size and 0 <= ny < self.grid_size and self.maze[ny][nx]:
-                    new_enemies.append((nx, ny))
-                else:
-                    new_enemies.append((ex, ey))
-            self.enemies = new_enemies
+            # Perform enemy movement, one random step per enemy
+            enemies = self._enemies_arr
+            moves_idx = self._rng.integers(0, len(ENEMY_MOVES), size=len(enemies))
+            candidates = enemies + ENEMY_MOVES[moves_idx]
+            # Each step is along one axis, so clamping an off-grid step leaves the enemy in place
+            np.clip(candidates, 0, self.grid_size-1, out=candidates)
+            valid = self.maze[candidates[:, 1], candidates[:, 0]]
+            self._enemies_arr = np.where(valid[:, None], candidates, enemies)
+            if not np.array_equal(self._enemies_arr, enemies):
+                self._dirty = True
 
     def draw(self):
-        self.screen.fill((0,0,0))
-        offset_x = (self.screen.get_width() - self.grid_size * self.cell_size) // 2
-        offset_y = (self.screen.get_height() - self.grid_size * self.cell_size) // 2
-        for y in range(self.grid_size):
-            for x in range(self.grid_size):
-                rect = pygame.Rect(offset_x + x*self.cell_size, offset_y + y*self.cell_size, self.cell_size, self.cell_size)
-                color = (50,50,50) if not self.maze[y][x] else (200,200,200)
-                pygame.draw.rect(self.screen, color, rect)
-        # Draw goal
-        gx, gy = self.goal
-        pygame.draw.rect(self.screen, (0,255,0), pygame.Rect(offset_x + gx*self.cell_size, offset_y + gy*self.cell_size, self.cell_size, self.cell_size))
-        # Draw players
+        rects = self._rects
+        screen = self.screen
         px1, py1 = self.player1_pos
         px2, py2 = self.player2_pos
-        pygame.draw.rect(self.screen, (0,0,255), pygame.Rect(offset_x + px1*self.cell_size, offset_y + py1*self.cell_size, self.cell_size, self.cell_size))
-        pygame.draw.rect(self.screen, (255,0,255), pygame.Rect(offset_x + px2*self.cell_size, offset_y + py2*self.cell_size, self.cell_size, self.cell_size))
-        # Draw enemies
-        for ex, ey in self.enemies:
-            pygame.draw.rect(self.screen, (255,0,0), pygame.Rect(offset_x + ex*self.cell_size, offset_y + ey*self.cell_size, self.cell_size, self.cell_size))
+        # Static maze and goal come from the cached background, then the moving sprites on top
+        screen.blit(self._bg, (0, 0))
+        sprites = [(self._tile_player1, rects[py1][px1]), (self._tile_player2, rects[py2][px2])]
+        sprites.extend((self._tile_enemy, rects[ey][ex]) for ex, ey in self._enemies_arr.tolist())
+        screen.blits(sprites, doreturn=False)
         pygame.display.flip()
 
     def check_game_over(self):
         if self.player1_pos == self.goal or self.player2_pos == self.goal:
             self.show_end_screen("You win! Press R to restart or Q to quit.")
             self.running = False
-        if self.player1_pos in self.enemies or self.player2_pos in self.enemies:
+        if self.hits_enemy(self.player1_pos) or self.hits_enemy(self.player2_pos):
             self.show_end_screen("Game Over! Press R to restart or Q to quit.")
             self.running = False
 
+    def hits_enemy(self, pos):
+        return bool((self._enemies_arr == pos).all(axis=1).any())
+
     def show_end_screen(self, message):
-        font = pygame.font.SysFont(None, 36)
-        text = font.render(message, True, (255,255,255))
-        rect = text.get_rect(center=(self.screen.get_width()//2, self.screen.get_height()//2))
-        self.screen.blit(text, rect)
+        if message not in self._end_surfs:
+            text = self._font_end.render(message, True, (255,255,255))
+            rect = text.get_rect(center=(self.screen.get_width()//2, self.screen.get_height()//2))
+            self._end_surfs[message] = (text, rect)
+        self.screen.blit(*self._end_surfs[message])
         pygame.display.flip()
         waiting = True
         while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            # Sleep until the next event instead of polling
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_r:
+                    self.reset_game()  # Restart the game
+                    waiting = False
+                elif event.key == pygame.K_q:
                     pygame.quit()
                     exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r:
-                        self.reset_game()  # Restart the game
-                        waiting = False
-                    elif event.key == pygame.K_q:
-                        pygame.quit()
-                        exit()
 
     def show_instructions(self):
-        instructions = [
-            "Quantum Adventure Game",
-            "",
-            "Use the arrow keys to move the blue player",
-            "The pink player is quantum entangled and moves in mirrored directions",
-            "Avoid the red enemies",
-            "Try to reach the green goal with either player",
-            "The maze paths (white squares) are generated using quantum superposition",
-            "The enemy movements are random walks",
-            "The game ends when either:",
-            "- One of the players reaches the goal (you win!)",
-            "- One of the players collides with an enemy (game over)",
-            "",
-            "Press any key to start..."
-        ]
         self.screen.fill((0,0,0))
-        font = pygame.font.SysFont(None, 32)
-        for i, line in enumerate(instructions):
-            text = font.render(line, True, (255,255,255))
-            rect = text.get_rect(center=(self.screen.get_width()//2, 40 + i*36))
-            self.screen.blit(text, rect)
+        self.screen.blits(self._instruction_surfs, doreturn=False)
         pygame.display.flip()
         waiting = True
         while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    waiting = False
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+            elif event.type == pygame.KEYDOWN:
+                waiting = False
 
     def run(self):
         self.show_instructions()
         while self.running:
             self.handle_input()
             self.update()
-            self.draw()
+            # Only redraw when something on the grid actually moved
+            if self._dirty:
+                self.draw()
+                self._dirty = False
             self.check_game_over()
             self.clock.tick(10)
 